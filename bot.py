@@ -2,11 +2,38 @@
 # Crypto RSI/MACD bot with provider rotation (OKX→Bybit→Binance), robust 4H→1H fallback,
 # diagnostics, CryptoPanic news (intraday/daily), safe error handling.
 
-import os, json, time, math, datetime as dt
+import os, json, time, math, threading, html, datetime as dt
 from datetime import timezone, timedelta
+from zoneinfo import ZoneInfo
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from urllib3.util import make_headers
 import pandas as pd
 
+# Optional JIT for the indicator recurrences (pip install numba); pandas ewm otherwise.
+# The compiled kernel is cached under .state (persisted by the workflow) so fresh runners skip the JIT;
+# numba keys that cache on bot.py's mtime, which the workflow pins to the last commit that changed bot.py.
+os.environ.setdefault("NUMBA_CACHE_DIR", os.path.join(".state", "numba"))
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# Optional IIR filter for the non-numba EMA path (pip install scipy); pandas ewm otherwise
+try:
+    from scipy.signal import lfilter
+except ImportError:
+    lfilter = None
+
+# Optional fast JSON (pip install orjson); stdlib json otherwise
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # -----------------------
 # Config (from env)
 # -----------------------
@@ -22,6 +49,11 @@ FAST = int(os.getenv("MACD_FAST", "12"))
 SLOW = int(os.getenv("MACD_SLOW", "26"))
 SIGN = int(os.getenv("MACD_SIGNAL", "9"))
 
+# Derived once at import: EMA smoothing factors (ewm span -> alpha) and effective RSI thresholds
+ALPHA_RSI, ALPHA_F, ALPHA_S, ALPHA_SIG = (2.0 / (n + 1) for n in (RSI_LEN, FAST, SLOW, SIGN))
+RSI_BUY_EFF = RSI_BUY - (5 if RSI_WIDE else 0)   # optionally widen 5%
+RSI_OPP_EFF = RSI_OPP - (5 if RSI_WIDE else 0)
+
 ENABLE_OPP = os.getenv("ENABLE_OPPORTUNITY", "true").lower() == "true"
 OPP_COOLDOWN_H = int(os.getenv("OPPORTUNITY_COOLDOWN_HOURS", "6"))
 
@@ -31,16 +63,29 @@ NEWS_COOLDOWN_H = int(os.getenv("NEWS_COOLDOWN_HOURS", "6"))
 
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN", "")
 TELEGRAM_CHAT = os.getenv("TELEGRAM_CHAT_ID", "")
+TG_URL = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendMessage" if TELEGRAM_TOKEN else None
 
 STATE_DIR = ".state"
 STATE_FILE = f"{STATE_DIR}/state.json"
+CANDLE_DIR = f"{STATE_DIR}/candles"   # incremental OHLC cache (persisted with .state by the workflow cache)
+CANDLE_CACHE = os.getenv("CANDLE_CACHE", "true").lower() == "true"
 
-# Lookbacks
-LOOKBACK_1H = int(os.getenv("LOOKBACK_1H", "900"))   # ~37 days of 1h
-LOOKBACK_1D = int(os.getenv("LOOKBACK_1D", "500"))   # ~1.3 years of 1D
+# Lookbacks: only the tail is used, so fetch just enough bars for the EMAs to converge
+# (~4x the slow span: (1-2/27)^104 ≈ 3e-4 of the seed left) plus a small margin
+EMA_WARMUP = max(SLOW * 4, RSI_LEN * 8, 60)
+LOOKBACK_1D = int(os.getenv("LOOKBACK_1D", str(EMA_WARMUP + 10)))       # 122 bars with defaults
+# 1H: 488 bars requested = 122 4H bars, but only Bybit/Binance serve that many. OKX caps a request at
+# 300 (75 4H bars) and Bitget at 200 (50 4H bars: below the 60-bar minimum, so BGB always uses the 1H fallback)
+LOOKBACK_1H = int(os.getenv("LOOKBACK_1H", str(4 * (EMA_WARMUP + 10))))
 
 UTC_TZ = timezone.utc
+DAILY_REPORT_HOUR = int(os.getenv("DAILY_REPORT_HOUR", "8"))   # local hour (LOCAL_TZ) from which daily + heartbeat go out
 LOCAL_TZNAME = os.getenv("LOCAL_TZ", "Europe/Rome")
+try:
+    LOCAL_TZ = ZoneInfo(LOCAL_TZNAME)   # resolved once at import
+except Exception:
+    print(f"[TZ] unknown LOCAL_TZ {LOCAL_TZNAME!r}, using UTC")
+    LOCAL_TZ = UTC_TZ
 
 # Fallback 1H flag
 ALLOW_1H_FALLBACK = os.getenv("ALLOW_1H_FALLBACK", "true").lower() == "true"
@@ -48,39 +93,137 @@ ALLOW_1H_FALLBACK = os.getenv("ALLOW_1H_FALLBACK", "true").lower() == "true"
 # Trend filter flag: off / buy_only_up / all_up
 TREND_FILTER = os.getenv("TREND_FILTER", "off").lower()
 
+# Max parallel HTTP fetches (coin × timeframe)
+FETCH_WORKERS = int(os.getenv("FETCH_WORKERS", "8"))
+
+# Provider rotation: a failing provider is moved to the back for this long (doubles per consecutive failure)
+PROVIDER_BACKOFF_S = int(os.getenv("PROVIDER_BACKOFF_SECONDS", "900"))
+# Hedged rotation (opt-in): start the next provider if the current one hasn't answered within this many seconds.
+# Only the series gets its data sooner: the slow request isn't cancelled and the process still waits for it
+# at exit (up to its 20 s timeout + retries). 0 = plain serial rotation (default).
+PROVIDER_HEDGE_S = float(os.getenv("PROVIDER_HEDGE_SECONDS", "0"))
+
+# Shared HTTP session: keep-alive connection pool + retry/backoff on transient errors
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=8,
+    pool_maxsize=16,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504]),
+))
+# Compressed JSON: kline payloads shrink ~6x on the wire (requests decodes transparently).
+# make_headers only advertises br/zstd when urllib3 can decode them (brotli / zstandard installed).
+SESSION.headers.update({"Accept-Encoding": make_headers(accept_encoding=True)["accept-encoding"], "Accept": "application/json",
+                        "User-Agent": "crypto-telegram-alerts/1.0"})
+
 # -----------------------
 # Utilities
 # -----------------------
 def now_utc():
     return dt.datetime.now(UTC_TZ)
 
-def send_telegram(msg: str):
-    if not TELEGRAM_TOKEN or not TELEGRAM_CHAT:
+def send_telegram(msg: str) -> int:
+    # Returns the HTTP status: 200 sent (missing token/chat prints the message and counts as sent),
+    # 0 when no answer came back (network error / timeout)
+    if not TG_URL or not TELEGRAM_CHAT:
         print("[TELEGRAM] Missing token/chat. Message:")
         print(msg)
-        return
-    url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendMessage"
+        return 200
     payload = {"chat_id": TELEGRAM_CHAT, "text": msg, "parse_mode": "HTML", "disable_web_page_preview": True}
     try:
-        r = requests.post(url, json=payload, timeout=15)
+        r = SESSION.post(TG_URL, json=payload, timeout=15)
         r.raise_for_status()
+        return 200
+    except requests.HTTPError as he:
+        print(f"[TELEGRAM] send failed: {he.response.status_code} {he.response.text[:200]}")
+        return he.response.status_code
     except Exception as e:
         print(f"[TELEGRAM] send failed: {e}")
+        return 0
+
+MAX_MSG = 4000   # Telegram rejects messages over 4096 chars
+MAX_OUTBOX = int(os.getenv("MAX_OUTBOX", "50"))   # unsent messages kept in state for the next run (oldest dropped)
+
+def flush_telegram(outbox: list) -> list:
+    # One sendMessage per ≤MAX_MSG chunk instead of one per alert (a single oversized message goes alone).
+    # Returns the messages worth retrying (no answer, 429, 5xx), so run_once can keep them in state["outbox"];
+    # any other 4xx won't get better on retry and is dropped.
+    unsent = []
+    def send(chunk, parts):
+        status = send_telegram(chunk)
+        if status == 200:
+            return
+        if status == 400 and len(parts) > 1:
+            # malformed entity in one message: resend the parts alone so only that one is lost
+            for m in parts:
+                send(m, [m])
+        elif status in (0, 429) or status >= 500:
+            unsent.extend(parts)
+        else:
+            print(f"[TELEGRAM] dropping {len(parts)} message(s) rejected with {status}")
+    chunk, parts = "", []
+    for msg in outbox:
+        if chunk and len(chunk) + 2 + len(msg) > MAX_MSG:
+            send(chunk, parts)
+            chunk, parts = msg, [msg]
+        else:
+            chunk = f"{chunk}\n\n{msg}" if chunk else msg
+            parts.append(msg)
+    if chunk:
+        send(chunk, parts)
+    return unsent
+
+def json_dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+# Response bodies are decoded with json_loads(r.content) too: orjson skips the text decode step
+def json_loads(b):
+    return orjson.loads(b) if orjson is not None else json.loads(b)
+
+_STATE_BYTES = None   # last state bytes read/written: save_state skips identical writes
+
+def write_state_bytes(b: bytes):
+    # Atomic replace: a run killed mid-write can't leave a torn state file
+    tmp = STATE_FILE + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(b)
+    os.replace(tmp, STATE_FILE)
+
+def default_state() -> dict:
+    return {"last_daily": "", "last_heartbeat": "", "cooldowns": {}, "newsCooldowns": {}, "outbox": []}
 
 def ensure_state():
     os.makedirs(STATE_DIR, exist_ok=True)
     if not os.path.exists(STATE_FILE):
-        with open(STATE_FILE, "w", encoding="utf-8") as f:
-            json.dump({"last_daily": "", "last_heartbeat": "", "cooldowns": {}, "newsCooldowns": {}}, f)
+        write_state_bytes(json_dumps(default_state()))
 
 def load_state():
+    global _STATE_BYTES
     ensure_state()
-    with open(STATE_FILE, "r", encoding="utf-8") as f:
-        return json.load(f)
+    with open(STATE_FILE, "rb") as f:
+        _STATE_BYTES = f.read()
+    try:
+        s = json_loads(_STATE_BYTES)
+        if not isinstance(s, dict):
+            raise ValueError(f"expected an object, got {type(s).__name__}")
+    except Exception as e:
+        # e.g. a truncated file from an older non-atomic write: start clean instead of crashing every run
+        print(f"[STATE] unreadable {STATE_FILE} ({e}), starting from defaults")
+        _STATE_BYTES = None
+        return default_state()
+    for k, v in default_state().items():
+        s.setdefault(k, v)
+    return s
 
 def save_state(s):
-    with open(STATE_FILE, "w", encoding="utf-8") as f:
-        json.dump(s, f)
+    global _STATE_BYTES
+    b = json_dumps(s)
+    if b == _STATE_BYTES:
+        print("[STATE] unchanged, write skipped")
+        return
+    write_state_bytes(b)
+    _STATE_BYTES = b
 
 def pct(a, b):
     if b == 0 or b is None or a is None:
@@ -90,68 +233,64 @@ def pct(a, b):
 # -----------------------
 # Provider helpers (OKX / Bybit / Binance)
 # -----------------------
-OKX_IDS = {"BTC": "BTC-USDT", "ETH": "ETH-USDT", "BNB": "BNB-USDT", "SOL": "SOL-USDT"}
-BYBIT_SYM = {"BTC": "BTCUSDT", "ETH": "ETHUSDT", "BNB": "BNBUSDT", "SOL": "SOLUSDT"}
+# Provider-specific symbol / interval strings, built once at import (BGB is served by Bitget only)
+PROVIDER_SYMBOLS = {c: {"okx": f"{c}-{BASE}", "bybit": f"{c}{BASE}", "binance": f"{c}{BASE}"} for c in COINS if c != "BGB"}
+PROVIDER_INTERVALS = {
+    "1h": {"okx": "1H", "bybit": "60", "binance": "1h"},
+    "1d": {"okx": "1D", "bybit": "D", "binance": "1d"},
+}
+LOOKBACKS = {"1h": LOOKBACK_1H, "1d": LOOKBACK_1D}
+
+OHLCV_COLS = ["open","high","low","close","volume"]
 
 def df_from_klines(rows, schema="binance"):
-    # rows: list, newest-last or first depending on api. Standardize to newest-last with UTC index.
-    # Binance schema known; OKX/Bybit convert below.
-    if schema == "binance":
-        cols = ["time","o","h","l","c","v","ct","qv","n","tb","qtb","ig"]
-        df = pd.DataFrame(rows, columns=cols)
-        df["time"] = pd.to_datetime(df["time"], unit="ms", utc=True)
-        df["open"] = df["o"].astype(float)
-        df["high"] = df["h"].astype(float)
-        df["low"] = df["l"].astype(float)
-        df["close"] = df["c"].astype(float)
-        df["volume"] = df["v"].astype(float)
-        return df[["time","open","high","low","close","volume"]].set_index("time")
+    # rows: list of [ts_ms, o, h, l, c, vol, ...] (strings or numbers, extra fields ignored).
+    # Bulk numpy conversion (no per-row Python loop); output is oldest→newest with UTC "time" index.
+    if not rows:
+        return pd.DataFrame()
+    arr = np.asarray(rows, dtype=object)
+    if arr.ndim != 2 or arr.shape[1] < 6:
+        raise ValueError(f"{schema}: unexpected kline shape {arr.shape}")
+    # Order from the timestamps themselves (OKX/Bybit/Bitget send newest first, Binance oldest first):
+    # no-op when already ascending, a view when strictly descending, argsort only as last resort
+    t = arr[:, 0].astype(np.int64)
+    d = np.diff(t)
+    if not (d > 0).all():
+        order = slice(None, None, -1) if (d < 0).all() else np.argsort(t, kind="stable")
+        arr, t = arr[order], t[order]
+    ts = pd.to_datetime(t, unit="ms", utc=True)
+    ohlcv = arr[:, 1:6].astype(np.float64)
+    return pd.DataFrame(ohlcv, columns=OHLCV_COLS, index=ts).rename_axis("time")
+
+# Max bars one request returns: a cold fetch never gets more, so the incremental cache trims to this too
+PROVIDER_MAX_BARS = {"okx": 300, "bybit": 1000, "binance": 1000, "bitget": 200}
 
 def fetch_okx(inst_id: str, bar: str, limit: int) -> pd.DataFrame:
     # bar: "1H"/"1D"
     url = "https://www.okx.com/api/v5/market/candles"
-    params = {"instId": inst_id, "bar": bar, "limit": min(limit, 300)}
-    r = requests.get(url, params=params, timeout=20)
+    params = {"instId": inst_id, "bar": bar, "limit": min(limit, PROVIDER_MAX_BARS["okx"])}
+    r = SESSION.get(url, params=params, timeout=20)
     r.raise_for_status()
-    j = r.json()
-    data = j.get("data", [])
-    if not data:
-        return pd.DataFrame()
+    j = json_loads(r.content)
     # OKX returns newest first: [ts, o,h,l,c, vol, volCcy, volCcyQuote, ...]
-    rows = []
-    for x in data[::-1]:
-        ts, o, h, l, c, vol = int(x[0]), float(x[1]), float(x[2]), float(x[3]), float(x[4]), float(x[5])
-        rows.append([pd.to_datetime(ts, unit="ms", utc=True), o, h, l, c, vol])
-    df = pd.DataFrame(rows, columns=["time","open","high","low","close","volume"]).set_index("time")
-    return df
+    return df_from_klines(j.get("data", []), "okx")
 
 def fetch_bybit(symbol: str, interval: str, limit: int) -> pd.DataFrame:
     # category spot
     url = "https://api.bybit.com/v5/market/kline"
-    params = {"category": "spot", "symbol": symbol, "interval": interval, "limit": min(limit, 1000)}
-    r = requests.get(url, params=params, timeout=20)
+    params = {"category": "spot", "symbol": symbol, "interval": interval, "limit": min(limit, PROVIDER_MAX_BARS["bybit"])}
+    r = SESSION.get(url, params=params, timeout=20)
     r.raise_for_status()
-    j = r.json()
-    data = j.get("result", {}).get("list", [])
-    if not data:
-        return pd.DataFrame()
+    j = json_loads(r.content)
     # Bybit newest first: [ts, o,h,l,c, vol, ...]
-    rows = []
-    for x in data[::-1]:
-        ts, o, h, l, c, v = int(x[0]), float(x[1]), float(x[2]), float(x[3]), float(x[4]), float(x[5])
-        rows.append([pd.to_datetime(ts, unit="ms", utc=True), o, h, l, c, v])
-    df = pd.DataFrame(rows, columns=["time","open","high","low","close","volume"]).set_index("time")
-    return df
+    return df_from_klines(j.get("result", {}).get("list", []), "bybit")
 
 def fetch_binance(symbol: str, interval: str, limit: int) -> pd.DataFrame:
     url = "https://api.binance.com/api/v3/klines"
-    params = {"symbol": symbol, "interval": interval, "limit": min(limit, 1000)}
-    r = requests.get(url, params=params, timeout=20)
+    params = {"symbol": symbol, "interval": interval, "limit": min(limit, PROVIDER_MAX_BARS["binance"])}
+    r = SESSION.get(url, params=params, timeout=20)
     r.raise_for_status()
-    data = r.json()
-    if not data:
-        return pd.DataFrame()
-    return df_from_klines(data, "binance")
+    return df_from_klines(json_loads(r.content), "binance")
 
 # Bitget (BGB only) – v2 requires granularity "1h" or "1day"
 def fetch_bitget_bgb(interval: str, limit: int) -> pd.DataFrame:
@@ -159,12 +298,13 @@ def fetch_bitget_bgb(interval: str, limit: int) -> pd.DataFrame:
     Bitget v2 (spot) K-line:
     - granularity must be one of: 1min,3min,5min,15min,30min,1h,4h,6h,12h,1day,1week,1M,6Hutc,12Hutc,1Dutc,3Dutc,1Wutc,1Mutc
     - data rows typically: [ts, open, high, low, close, baseVol, quoteVol, ...]  (>=6 fields)
-      We map the first 6: ts,o,h,l,c,volume (use baseVol if present, else 0)
+      We map the first 6: ts,o,h,l,c,volume (baseVol) via df_from_klines
     - Some endpoints return newest-first: we reverse to oldest→newest.
     """
     gran_map = {"1h": "1h", "1d": "1day"}
     gran = gran_map[interval]
-    lim = min(max(int(limit), 1), 200)  # v2 spesso max 200
+    lim = min(max(int(limit), 1), PROVIDER_MAX_BARS["bitget"])  # v2 spesso max 200
+    end_ms = int(time.time() * 1000)
 
     attempts = [
         # 1) candles (senza endTime)
@@ -174,15 +314,15 @@ def fetch_bitget_bgb(interval: str, limit: int) -> pd.DataFrame:
         # 2) history-candles (con endTime)
         ("https://api.bitget.com/api/v2/spot/market/history-candles",
          {"symbol": "BGBUSDT", "granularity": gran, "limit": str(lim),
-          "endTime": str(int(dt.datetime.now(timezone.utc).timestamp() * 1000))}),
+          "endTime": str(end_ms)}),
     ]
 
     last_err = None
     for url, params in attempts:
         try:
-            r = requests.get(url, params=params, timeout=20)
+            r = SESSION.get(url, params=params, timeout=20)
             r.raise_for_status()
-            j = r.json()
+            j = json_loads(r.content)
 
             if j.get("code") != "00000" or "data" not in j:
                 last_err = f"[BGB] Bitget unexpected payload: {j}"
@@ -195,18 +335,11 @@ def fetch_bitget_bgb(interval: str, limit: int) -> pd.DataFrame:
                 print(last_err)
                 continue
 
-            # v2: newest-first → invertiamo
-            rows = data[::-1]
-            recs = []
-            for row in rows:
-                # row può avere 6,7,8... campi: prendiamo i primi 6 in ordine noto
-                ts = int(row[0])
-                o = float(row[1]); h = float(row[2]); l = float(row[3]); c = float(row[4])
-                v = float(row[5]) if len(row) > 5 else 0.0
-                t = pd.to_datetime(ts, unit="ms", utc=True)
-                recs.append([t, o, h, l, c, v])
-
-            df = pd.DataFrame(recs, columns=["time","open","high","low","close","volume"]).set_index("time")
+            # v2: newest-first, righe con 6,7,8... campi: df_from_klines prende i primi 6.
+            # Ragged rows / missing baseVol: cut to 6 fields, volume 0.0 when absent (as the old per-row parser)
+            if len({len(row) for row in data}) > 1 or len(data[0]) < 6:
+                data = [list(row[:6]) if len(row) > 5 else list(row[:5]) + [0.0] for row in data]
+            df = df_from_klines(data, "bitget")
             if not df.empty:
                 return df
 
@@ -224,64 +357,251 @@ def fetch_bitget_bgb(interval: str, limit: int) -> pd.DataFrame:
     return pd.DataFrame()
 
 # ---- Unified fetchers with rotation ----
+# Per-run memo, cleared at the top of run_once: each (symbol, timeframe) hits the network once
+_OHLC_CACHE = {}
+
 def fetch_ohlc_1h(symbol: str) -> pd.DataFrame:
-    if symbol == "BGB":
-        try:
-            return fetch_bitget_bgb("1h", LOOKBACK_1H)
-        except Exception as e:
-            print("BGB 1h fetch error:", e)
-            return pd.DataFrame()
-    # rotation: OKX → Bybit → Binance
-    try:
-        return fetch_okx(OKX_IDS[symbol], "1H", LOOKBACK_1H)
-    except Exception as e:
-        print(symbol, "OKX 1H fail:", e)
+    return fetch_ohlc(symbol, "1h")
+
+def fetch_ohlc_1d(symbol: str) -> pd.DataFrame:
+    return fetch_ohlc(symbol, "1d")
+
+def fetch_ohlc(symbol: str, tf: str) -> pd.DataFrame:
+    key = (symbol, tf)
+    if key not in _OHLC_CACHE:
+        _OHLC_CACHE[key] = _fetch_ohlc_cached(symbol, tf)
+    return _OHLC_CACHE[key]
+
+# ---- Disk cache (.state/candles, persisted by the workflow cache) ----
+# Every run fetches only the bars since the last cached one (+ that one, it may still have been forming)
+# from the same provider, merges and trims to the lookback. Anything odd → full fetch.
+TF_SECONDS = {"1h": 3600, "1d": 86400}
+
+def _candle_path(symbol: str, tf: str) -> str:
+    return f"{CANDLE_DIR}/{symbol}_{tf}.pkl"
+
+def load_candles(symbol: str, tf: str) -> dict | None:
+    if not CANDLE_CACHE:
+        return None
     try:
-        return fetch_bybit(BYBIT_SYM[symbol], "60", LOOKBACK_1H)
+        entry = pd.read_pickle(_candle_path(symbol, tf))
+        if entry.get("limit") == LOOKBACKS[tf] and not entry["df"].empty:
+            return entry
+    except FileNotFoundError:
+        pass
     except Exception as e:
-        print(symbol, "Bybit 1H fail:", e)
+        print(f"[CANDLES] {symbol} {tf} cache read err:", e)
+    return None
+
+def save_candles(symbol: str, tf: str, df: pd.DataFrame, provider: str | None):
+    if not CANDLE_CACHE or df is None or df.empty:
+        return
     try:
-        return fetch_binance(symbol + BASE, "1h", LOOKBACK_1H)
+        os.makedirs(CANDLE_DIR, exist_ok=True)
+        path = _candle_path(symbol, tf)
+        pd.to_pickle({"limit": LOOKBACKS[tf], "provider": provider, "df": df}, path + ".tmp")
+        os.replace(path + ".tmp", path)
     except Exception as e:
-        print(symbol, "Binance 1H fail:", e)
-        return pd.DataFrame()
+        print(f"[CANDLES] {symbol} {tf} cache write err:", e)
+
+def _fetch_ohlc_cached(symbol: str, tf: str) -> pd.DataFrame:
+    entry = load_candles(symbol, tf)
+    limit = LOOKBACKS[tf]
+    if entry is not None and entry.get("provider"):
+        old = entry["df"]
+        # bars opened since the last cached one, +1 to refresh it (it was still forming), +1 margin
+        n_new = int((now_utc() - old.index[-1]).total_seconds() // TF_SECONDS[tf]) + 2
+        if n_new < limit:
+            new, p = _fetch_ohlc(symbol, tf, n_new, only=entry["provider"])
+            if not new.empty and new.index[0] <= old.index[-1]:   # overlaps the cache: no gap
+                # same depth a cold fetch from p returns, so indicators don't depend on the cache's age
+                merged = pd.concat([old[old.index < new.index[0]], new]).tail(min(limit, PROVIDER_MAX_BARS[p]))
+                save_candles(symbol, tf, merged, p)
+                return merged
+    df, p = _fetch_ohlc(symbol, tf)
+    save_candles(symbol, tf, df, p)
+    return df
 
-def fetch_ohlc_1d(symbol: str) -> pd.DataFrame:
+def _fetch_ohlc(symbol: str, tf: str, limit: int | None = None, only: str | None = None):
+    # tf: "1h" / "1d"; returns (df, provider) – provider None when nothing was fetched.
+    # only: restrict to one provider (incremental merge must not mix exchanges)
+    limit = limit or LOOKBACKS[tf]
     if symbol == "BGB":
+        if only not in (None, "bitget"):
+            return pd.DataFrame(), None
         try:
-            return fetch_bitget_bgb("1d", LOOKBACK_1D)
+            df = fetch_bitget_bgb(tf, limit)
+            return df, ("bitget" if not df.empty else None)
         except Exception as e:
-            print("BGB 1d fetch error:", e)
+            print(f"BGB {tf} fetch error:", e)
+            return pd.DataFrame(), None
+    syms = PROVIDER_SYMBOLS[symbol]
+    ivs = PROVIDER_INTERVALS[tf]
+    # rotation: OKX → Bybit → Binance by default, last known-good provider first (see provider_order)
+    order = provider_order(PROVIDERS) if only is None else [p for p in PROVIDERS if p == only]
+    def attempt(p):
+        try:
+            df = PROVIDERS[p](syms[p], ivs[p], limit)
+        except Exception as e:
+            print(symbol, f"{PROVIDER_NAMES[p]} {tf.upper()} fail:", e)
+            mark_provider(p, False)
+            return None
+        mark_provider(p, True)
+        if df.empty:
+            print(symbol, f"{PROVIDER_NAMES[p]} {tf.upper()} empty")
+            return None
+        return df
+    if PROVIDER_HEDGE_S <= 0 or len(order) < 2:
+        for p in order:
+            df = attempt(p)
+            if df is not None:
+                return df, p
+        return pd.DataFrame(), None
+    # Hedged: the next provider starts as soon as the current one fails or is slower than PROVIDER_HEDGE_S;
+    # first non-empty answer wins (ties → rotation order), stragglers finish in the background
+    queue, pending = list(order), {}
+    while queue or pending:
+        if queue:
+            p = queue.pop(0)
+            pending[_HEDGE_POOL.submit(attempt, p)] = p
+        done, _ = wait(pending, timeout=PROVIDER_HEDGE_S if queue else None, return_when=FIRST_COMPLETED)
+        for f in sorted(done, key=lambda f: order.index(pending[f])):
+            p = pending.pop(f)
+            df = f.result()
+            if df is not None:
+                return df, p
+    return pd.DataFrame(), None
+
+# ---- Provider health (persisted in state["provider_health"] by run_once) ----
+# Own pool for hedged attempts: prefetch_ohlc workers block on these, so they can't share its executor
+_HEDGE_POOL = ThreadPoolExecutor(max_workers=2 * FETCH_WORKERS, thread_name_prefix="hedge")
+PROVIDERS = {"okx": fetch_okx, "bybit": fetch_bybit, "binance": fetch_binance}
+PROVIDER_NAMES = {"okx": "OKX", "bybit": "Bybit", "binance": "Binance"}
+PROVIDER_HEALTH = {}   # provider -> {"ok": last success ts, "fail": last failure ts, "streak": consecutive failures}
+_HEALTH_LOCK = threading.Lock()
+
+def mark_provider(p: str, ok: bool):
+    # Only request errors count as failures: an empty answer (e.g. unlisted pair) doesn't bench a provider
+    with _HEALTH_LOCK:
+        h = PROVIDER_HEALTH.setdefault(p, {"ok": 0, "fail": 0, "streak": 0})
+        if ok:
+            h["ok"] = time.time()
+            h["streak"] = 0
+        else:
+            h["fail"] = time.time()
+            h["streak"] += 1
+
+def provider_order(providers) -> list:
+    # Providers in backoff go last (still tried as a last resort); the rest by most recent success
+    nowt = time.time()
+    def key(p):
+        h = PROVIDER_HEALTH.get(p, {})
+        streak = h.get("streak", 0)
+        benched = streak > 0 and nowt < h.get("fail", 0) + PROVIDER_BACKOFF_S * 2 ** min(streak - 1, 6)
+        return (benched, -h.get("ok", 0))
+    return sorted(providers, key=key)
+
+def prefetch_ohlc(coins) -> dict:
+    """
+    Fetch 1H + 1D candles for all coins concurrently (I/O bound: requests releases the GIL).
+    Returns {coin: (df1h, df1d)}; a failed fetch yields an empty DataFrame.
+    """
+    def _result(fut, label):
+        try:
+            return fut.result()
+        except Exception as e:
+            print(f"[PREFETCH] {label} error: {e}")
             return pd.DataFrame()
-    # rotation: OKX → Bybit → Binance
-    try:
-        return fetch_okx(OKX_IDS[symbol], "1D", LOOKBACK_1D)
-    except Exception as e:
-        print(symbol, "OKX 1D fail:", e)
-    try:
-        return fetch_bybit(BYBIT_SYM[symbol], "D", LOOKBACK_1D)
-    except Exception as e:
-        print(symbol, "Bybit 1D fail:", e)
-    try:
-        return fetch_binance(symbol + BASE, "1d", LOOKBACK_1D)
-    except Exception as e:
-        print(symbol, "Binance 1D fail:", e)
-        return pd.DataFrame()
+
+    workers = max(1, min(FETCH_WORKERS, 2 * len(coins)))
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        f1h = {c: ex.submit(fetch_ohlc_1h, c) for c in coins}
+        f1d = {c: ex.submit(fetch_ohlc_1d, c) for c in coins}
+        return {c: (_result(f1h[c], f"{c} 1h"), _result(f1d[c], f"{c} 1d")) for c in coins}
 
 # -----------------------
-# Indicators (pure pandas)
+# Indicators (pandas, Numba kernels when available)
 # -----------------------
+if njit is not None:
+    # Explicit signature (float32 I/O = IND_DTYPE, float64 state): compiled/loaded at import, no type inference
+    @njit("void(float32[:], float64, float64, float64, float64, float32[:], float32[:], float32[:], float32[:], float64[:])",
+          cache=True)
+    def _ind_nb(c, a_rsi, a_f, a_s, a_sig, rsi_out, macd_out, sig_out, hist_out, st_out):
+        # RSI + MACD fused into one pass over close: 5 running EMA scalars instead of 5 array passes.
+        # Same recurrences/seeding as the pandas path (ewm span, adjust=False); rsi_out[0] is NaN
+        # like series.diff(). Input must be NaN-free.
+        # st_out receives (close, ef, es, sg, ru, rd) at the last closed bar (n-2), see resume_indicators.
+        n = c.shape[0]
+        if n == 0:
+            return
+        prev = np.float64(c[0])
+        ef = prev
+        es = prev
+        sg = 0.0
+        ru = 0.0
+        rd = 0.0
+        rsi_out[0] = np.nan
+        macd_out[0] = 0.0
+        sig_out[0] = 0.0
+        hist_out[0] = 0.0
+        for i in range(1, n):
+            x = np.float64(c[i])
+            d = x - prev
+            prev = x
+            up = d if d > 0.0 else 0.0
+            dn = -d if d < 0.0 else 0.0
+            if i == 1:
+                ru = up
+                rd = dn
+            else:
+                ru = a_rsi * up + (1.0 - a_rsi) * ru
+                rd = a_rsi * dn + (1.0 - a_rsi) * rd
+            den = rd if rd != 0.0 else 1e-10
+            rsi_out[i] = 100.0 - 100.0 / (1.0 + ru / den)
+            ef = a_f * x + (1.0 - a_f) * ef
+            es = a_s * x + (1.0 - a_s) * es
+            m = ef - es
+            sg = a_sig * m + (1.0 - a_sig) * sg
+            macd_out[i] = m
+            sig_out[i] = sg
+            hist_out[i] = m - sg
+            if i == n - 2:
+                st_out[0] = x
+                st_out[1] = ef
+                st_out[2] = es
+                st_out[3] = sg
+                st_out[4] = ru
+                st_out[5] = rd
+
+# Kernel input/output dtype: float32 halves the bytes moved; the recurrences accumulate in float64
+IND_DTYPE = np.float32
+IND_WARMUP = 1   # leading bars without a defined RSI (series.diff)
+
+def _ema_np(x: np.ndarray, n: int) -> np.ndarray:
+    if lfilter is None:
+        return pd.Series(x).ewm(span=n, adjust=False).mean().to_numpy()
+    # same recursion as ewm(adjust=False): y[t] = a*x[t] + (1-a)*y[t-1], seeded on the first valid value
+    a = 2.0 / (n + 1)
+    y = np.full_like(x, np.nan)
+    ok = np.flatnonzero(~np.isnan(x))
+    if ok.size:
+        k = ok[0]
+        y[k:], _ = lfilter([a], [1.0, a - 1.0], x[k:], zi=[(1.0 - a) * x[k]])
+    return y
+
 def ema(s: pd.Series, n: int) -> pd.Series:
-    return s.ewm(span=n, adjust=False).mean()
+    return pd.Series(_ema_np(s.to_numpy(dtype=np.float64), n), index=s.index)
 
 def rsi(series: pd.Series, n: int = 14) -> pd.Series:
-    delta = series.diff()
-    up = delta.clip(lower=0.0)
-    down = -delta.clip(upper=0.0)
-    roll_up = ema(up, n)
-    roll_down = ema(down, n)
-    rs = roll_up / roll_down.replace(0, 1e-10)
-    return 100.0 - (100.0 / (1.0 + rs))
+    # plain ndarray math; delta[0] stays NaN like Series.diff() so the EMAs seed on the same bar
+    c = series.to_numpy(dtype=np.float64)
+    delta = np.empty_like(c)
+    delta[0] = np.nan
+    np.subtract(c[1:], c[:-1], out=delta[1:])
+    roll_up = _ema_np(np.maximum(delta, 0.0), n)
+    roll_down = _ema_np(np.maximum(-delta, 0.0), n)
+    rs = roll_up / np.where(roll_down == 0, 1e-10, roll_down)
+    return pd.Series(100.0 - (100.0 / (1.0 + rs)), index=series.index)
 
 def macd(series: pd.Series, fast=12, slow=26, signal=9):
     m = ema(series, fast) - ema(series, slow)
@@ -289,27 +609,100 @@ def macd(series: pd.Series, fast=12, slow=26, signal=9):
     h = m - s
     return m, s, h
 
-def add_indicators(df: pd.DataFrame) -> pd.DataFrame | None:
-    if df is None or df.empty or len(df) < max(SLOW+SIGN+5, 60):
-        print(f"⚠️ add_indicators: dataframe vuoto o troppo corto (len = {0 if df is None else len(df)} )")
+# Per-run memo keyed on the input frame (kept alive in the value so id() cannot be reused)
+_IND_CACHE = {}
+
+def add_indicators(df: pd.DataFrame, cache: dict | None = None, key: str | None = None) -> pd.DataFrame | None:
+    hit = _IND_CACHE.get(id(df))
+    if hit is not None and hit[0] is df:
+        return hit[1]
+    out = _add_indicators(df, cache, key)
+    _IND_CACHE[id(df)] = (df, out)
+    return out
+
+def _add_indicators(df: pd.DataFrame, cache: dict | None = None, key: str | None = None) -> pd.DataFrame | None:
+    # Lean output {close, rsi, macd, macd_signal, macd_hist}: callers never read open/high/low/volume
+    if df is None or df.empty:
+        print("⚠️ add_indicators: dataframe vuoto (len = 0 )")
         return None
-    out = df.copy()
-    out["rsi"] = rsi(out["close"], RSI_LEN)
-    m, s, h = macd(out["close"], FAST, SLOW, SIGN)
-    out["macd"] = m
-    out["macd_signal"] = s
-    out["macd_hist"] = h
-    return out.dropna().copy()
+    return add_indicators_from_close(df["close"], cache, key)
+
+# ---- Persistent indicator cache (state["ind_cache"]) ----
+# The newest candle is still forming, so results can't be cached as-is. Instead the kernel state
+# at the last *closed* bar is stored; while that bar, the window start and the params are unchanged
+# (1D: all day, 4H: within the bucket) the next run only steps the forming bar: O(1), same values.
+def _ts_ms(ts) -> int:
+    return int(ts.value // 1_000_000)
+
+def resume_indicators(close: pd.Series, entry: dict | None) -> pd.DataFrame | None:
+    if not entry or len(close) - 1 != entry.get("n") or entry.get("p") != [RSI_LEN, FAST, SLOW, SIGN]:
+        return None
+    idx = close.index
+    if _ts_ms(idx[0]) != entry["first"] or _ts_ms(idx[-2]) != entry["ts"]:
+        return None
+    if float(IND_DTYPE(close.iloc[-2])) != entry["close"]:   # e.g. provider switched
+        return None
+    a_rsi, a_f, a_s, a_sig = ALPHA_RSI, ALPHA_F, ALPHA_S, ALPHA_SIG
+    c0, ef, es, sg, ru, rd = entry["close"], entry["ef"], entry["es"], entry["sg"], entry["ru"], entry["rd"]
+    rsi0 = 100.0 - 100.0 / (1.0 + ru / (rd if rd != 0.0 else 1e-10))
+    x = float(IND_DTYPE(close.iloc[-1]))
+    d = x - c0
+    ru = a_rsi * max(d, 0.0) + (1.0 - a_rsi) * ru
+    rd = a_rsi * max(-d, 0.0) + (1.0 - a_rsi) * rd
+    rsi1 = 100.0 - 100.0 / (1.0 + ru / (rd if rd != 0.0 else 1e-10))
+    ef = a_f * x + (1.0 - a_f) * ef
+    es = a_s * x + (1.0 - a_s) * es
+    m0, m1 = entry["ef"] - entry["es"], ef - es
+    sg1 = a_sig * m1 + (1.0 - a_sig) * sg
+    return pd.DataFrame({
+        "close": close.iloc[-2:].to_numpy(),
+        "rsi": [rsi0, rsi1],
+        "macd": [m0, m1],
+        "macd_signal": [sg, sg1],
+        "macd_hist": [m0 - sg, m1 - sg1],
+    }, index=idx[-2:])
+
+def add_indicators_from_close(close: pd.Series, cache: dict | None = None, key: str | None = None) -> pd.DataFrame | None:
+    # close stays float64 (prices are printed in alerts); indicator columns come out as IND_DTYPE with numba.
+    # cache/key: optional persistent kernel-state cache (numba path only), see resume_indicators.
+    if close is None or len(close) < max(SLOW+SIGN+5, 60):
+        print(f"⚠️ add_indicators: serie close vuota o troppo corta (len = {0 if close is None else len(close)} )")
+        return None
+    if njit is not None:
+        if cache is not None:
+            out = resume_indicators(close, cache.get(key))
+            if out is not None:
+                return out
+        c = close.to_numpy(IND_DTYPE)
+        r, m, s, h = (np.empty_like(c) for _ in range(4))
+        st = np.zeros(6)
+        _ind_nb(c, ALPHA_RSI, ALPHA_F, ALPHA_S, ALPHA_SIG, r, m, s, h, st)
+        if cache is not None:
+            cache[key] = {"first": _ts_ms(close.index[0]), "ts": _ts_ms(close.index[-2]), "n": len(c) - 1,
+                          "p": [RSI_LEN, FAST, SLOW, SIGN],
+                          **dict(zip(["close", "ef", "es", "sg", "ru", "rd"], st.tolist()))}
+    else:
+        m, s, h = (v.to_numpy() for v in macd(close, FAST, SLOW, SIGN))
+        r = rsi(close, RSI_LEN).to_numpy()
+    # Only bar 0 is undefined (RSI needs one diff; input is NaN-free): slice it off instead of dropna
+    w = IND_WARMUP
+    return pd.DataFrame({"close": close.to_numpy()[w:], "rsi": r[w:], "macd": m[w:], "macd_signal": s[w:], "macd_hist": h[w:]},
+                        index=close.index[w:])
 
 # 4H from 1H with optional fallback to 1H
 def resample_to_4h(df1h: pd.DataFrame):
     if df1h is None or df1h.empty:
         return None, "no-1h"
-    ohlc = df1h["close"].resample("4h", label="right", closed="right").ohlc()
-    vol = df1h["volume"].resample("4h", label="right", closed="right").sum()
-    df4 = pd.concat([ohlc, vol], axis=1)
-    df4.columns = ["open","high","low","close","volume"]
-    df4 = df4.dropna()
+    # Indicators only read close, so build just close (last) + volume (sum) instead of full OHLC.
+    # Same buckets as resample("4h", label="right", closed="right") + dropna, done on the sorted
+    # int64 timestamps: bucket = ceil(t / 4h), empty buckets simply never appear.
+    P = 4 * 3600 * 10**9
+    key = -(-df1h.index.as_unit("ns").asi8 // P)
+    starts = np.flatnonzero(np.r_[True, key[1:] != key[:-1]])
+    ends = np.r_[starts[1:], len(key)] - 1
+    idx = pd.to_datetime(key[starts] * P, unit="ns", utc=True).as_unit(df1h.index.unit).rename(df1h.index.name)
+    df4 = pd.DataFrame({"close": df1h["close"].to_numpy()[ends],
+                        "volume": np.add.reduceat(df1h["volume"].to_numpy(), starts)}, index=idx)
     if len(df4) < 60:
         if ALLOW_1H_FALLBACK:
             print(f"[FALLBACK] 4H insufficiente (len={len(df4)}). Uso 1H per segnali intraday.")
@@ -322,55 +715,68 @@ def resample_to_4h(df1h: pd.DataFrame):
 # -----------------------
 # Signals + reasons
 # -----------------------
-def evaluate_signals(symbol: str, state, nowu: dt.datetime) -> dict:
+def evaluate_signals(symbol: str, state, nowu: dt.datetime, df1h=None, df1d=None, ind_cache=None) -> dict:
+    # df1h/df1d can be prefetched by run_once (see prefetch_ohlc); fetch here otherwise.
+    # Read-only on state: a new OPP cooldown is returned in res["cooldowns"] (merged by the caller),
+    # indicator kernel state goes to ind_cache (default: state["ind_cache"]).
     try:
-        df1h = fetch_ohlc_1h(symbol)
-        df1d = fetch_ohlc_1d(symbol)
+        if df1h is None:
+            df1h = fetch_ohlc_1h(symbol)
+        if df1d is None:
+            df1d = fetch_ohlc_1d(symbol)
     except Exception as e:
         return {"ok": False, "reason": f"fetch-error: {e}"}
 
+    # 1D indicators are also returned ("d1") so build_daily_table can reuse them
+    if ind_cache is None:
+        ind_cache = state.setdefault("ind_cache", {})
+    d1 = add_indicators(df1d, ind_cache, f"{symbol}_1d") if df1d is not None and not df1d.empty else None
     if df1h is None or df1h.empty:
-        return {"ok": False, "reason": "no-1h-data"}
+        return {"ok": False, "reason": "no-1h-data", "d1": d1}
     if df1d is None or df1d.empty:
         return {"ok": False, "reason": "no-1d-data"}
 
     # Trend 1D
-    d1 = add_indicators(df1d)
     if d1 is None or d1.empty:
         trend = "UNKNOWN"
     else:
-        last = d1.iloc[-1]
-        prev = d1.iloc[-2] if len(d1) > 1 else last
-        if last["macd"] > last["macd_signal"] and last["macd_hist"] > prev["macd_hist"]:
+        # tail reads on the numpy columns (no per-row Series)
+        m1, s1, h1 = d1["macd"].to_numpy(), d1["macd_signal"].to_numpy(), d1["macd_hist"].to_numpy()
+        j = -2 if len(d1) > 1 else -1
+        if m1[-1] > s1[-1] and h1[-1] > h1[j]:
             trend = "UP"
-        elif last["macd"] < last["macd_signal"] and last["macd_hist"] < prev["macd_hist"]:
+        elif m1[-1] < s1[-1] and h1[-1] < h1[j]:
             trend = "DOWN"
         else:
             trend = "FLAT"
 
+    # all_up blocks BUY and OPP on any non-UP 1D trend: the intraday frame can't change the outcome, skip it
+    if TREND_FILTER == "all_up" and trend != "UP":
+        return {"ok": False, "reason": f"blocked-by-1D-trend({trend})", "trend1d": trend, "d1": d1}
+
     # 4H (or fallback 1H) for intraday signals
     dfX, used = resample_to_4h(df1h)
     if dfX is None or used == "none":
-        return {"ok": False, "reason": f"insufficient-4h-no-fallback"}
+        return {"ok": False, "reason": f"insufficient-4h-no-fallback", "d1": d1}
 
-    x = add_indicators(dfX)
+    x = add_indicators_from_close(dfX["close"], ind_cache, f"{symbol}_{used}")
     if x is None or x.empty:
-        return {"ok": False, "reason": f"no-{used}-indicators"}
+        return {"ok": False, "reason": f"no-{used}-indicators", "d1": d1}
 
-    last = x.iloc[-1]
-    prev = x.iloc[-2] if len(x) > 1 else last
-    price = last["close"]
+    rsi_a, macd_a, sig_a, hist_a = (x[k].to_numpy() for k in ("rsi", "macd", "macd_signal", "macd_hist"))
+    j = -2 if len(x) > 1 else -1
+    price = float(x["close"].to_numpy()[-1])
+    rsi_last = float(rsi_a[-1])
 
     # MACD cross up?
-    crossUp = last["macd"] >= last["macd_signal"] and prev["macd"] < prev["macd_signal"]
-    histImproving = (last["macd_hist"] > prev["macd_hist"])
+    crossUp = macd_a[-1] >= sig_a[-1] and macd_a[j] < sig_a[j]
+    histImproving = (hist_a[-1] > hist_a[j])
 
-    # RSI thresholds (optionally widen 5%)
-    rsiBuy = RSI_BUY - (5 if RSI_WIDE else 0)
-    rsiOpp = RSI_OPP - (5 if RSI_WIDE else 0)
+    # RSI thresholds (optionally widen 5%, see RSI_BUY_EFF/RSI_OPP_EFF)
+    rsiBuy, rsiOpp = RSI_BUY_EFF, RSI_OPP_EFF
 
-    condBUY = (last["rsi"] <= rsiBuy) and crossUp
-    condOPPcore = (last["rsi"] <= rsiOpp) and (last["macd"] > last["macd_signal"])
+    condBUY = (rsi_last <= rsiBuy) and crossUp
+    condOPPcore = (rsi_last <= rsiOpp) and (macd_a[-1] > sig_a[-1])
     condOPP = condOPPcore or histImproving
 
     # Trend filter modes
@@ -388,7 +794,7 @@ def evaluate_signals(symbol: str, state, nowu: dt.datetime) -> dict:
         trendOK = (trend != "DOWN") or condOPP
 
     if not trendOK:
-        return {"ok": False, "reason": f"blocked-by-1D-trend({trend})", "price": price, "trend1d": trend, "frameUsed": used}
+        return {"ok": False, "reason": f"blocked-by-1D-trend({trend})", "price": price, "trend1d": trend, "frameUsed": used, "d1": d1}
 
     # Cooldown logic for OPP
     coinKey = f"{symbol}_OPP"
@@ -401,55 +807,73 @@ def evaluate_signals(symbol: str, state, nowu: dt.datetime) -> dict:
         opp = (condOPP and not buy and not cooldown_active)
 
     if buy:
-        return {"ok": True, "reason": "BUY", "price": price, "buy": True, "opp": False, "trend1d": trend, "frameUsed": used}
+        return {"ok": True, "reason": "BUY", "price": price, "buy": True, "opp": False, "trend1d": trend, "frameUsed": used, "d1": d1}
     if opp:
-        state["cooldowns"][coinKey] = (nowu + timedelta(hours=OPP_COOLDOWN_H)).timestamp()
-        return {"ok": True, "reason": "OPPORTUNITY", "price": price, "buy": False, "opp": True, "trend1d": trend, "frameUsed": used}
+        until = (nowu + timedelta(hours=OPP_COOLDOWN_H)).timestamp()
+        return {"ok": True, "reason": "OPPORTUNITY", "price": price, "buy": False, "opp": True, "trend1d": trend, "frameUsed": used, "d1": d1,
+                "cooldowns": {coinKey: until}}
 
     details = []
-    if last["rsi"] > rsiOpp:
+    if rsi_last > rsiOpp:
         details.append(f"RSI>{rsiOpp:.0f}")
     if not crossUp and not buy:
         details.append("no MACD cross↑")
     if not histImproving and not crossUp:
         details.append("hist not improving")
 
-    return {"ok": False, "reason": "no-signal(" + ", ".join(details) + ")", "price": price, "trend1d": trend, "frameUsed": used}
+    return {"ok": False, "reason": "no-signal(" + ", ".join(details) + ")", "price": price, "trend1d": trend, "frameUsed": used, "d1": d1}
+
+def process_coin(symbol: str, state, nowu: dt.datetime, df1h=None, df1d=None):
+    """
+    Evaluate one coin without touching state, so coins can run in worker threads.
+    Returns (result, updates); run_once merges updates into state serially, in coin order.
+    """
+    ind_cache = {k: v for k, v in state.get("ind_cache", {}).items() if k.startswith(f"{symbol}_")}
+    try:
+        res = evaluate_signals(symbol, state, nowu, df1h, df1d, ind_cache)
+    except Exception as e:
+        res = {"ok": False, "reason": f"eval-error: {e}"}
+    return res, {"cooldowns": res.pop("cooldowns", {}), "ind_cache": ind_cache}
+
+def merge_coin_updates(state, updates: dict):
+    state.setdefault("cooldowns", {}).update(updates.get("cooldowns", {}))
+    state.setdefault("ind_cache", {}).update(updates.get("ind_cache", {}))
 
 # -----------------------
 # Daily + Heartbeat
 # -----------------------
-def should_send_daily_report(state):
-    today = now_utc().date().isoformat()
+# today: local ISO date computed once per run by run_once (defaults to the current LOCAL_TZ date)
+def should_send_daily_report(state, today: str | None = None):
+    today = today or now_utc().astimezone(LOCAL_TZ).date().isoformat()
     return state.get("last_daily", "") != today
 
-def should_send_heartbeat(state):
-    today = now_utc().date().isoformat()
+def should_send_heartbeat(state, today: str | None = None):
+    today = today or now_utc().astimezone(LOCAL_TZ).date().isoformat()
     return state.get("last_heartbeat", "") != today
 
-def build_daily_table():
+# Row formats prebuilt once (bound str.format) instead of re-parsing an f-string per coin
+_DAILY_ROW = "{:5} {:7.2f}% {:8.3f}  {:>5}".format
+_DAILY_NA = "{:5}    n/a     n/a    n/a".format
+
+def build_daily_table(per_coin: dict):
+    # per_coin: {coin: evaluate_signals result}; reuses its "d1" indicators (no refetch/recompute)
     lines = []
     lines.append("SYMB   1D Δ%   MACDΔ%   TREND")
     lines.append("-----  ------  -------  ------")
     for c in COINS:
         try:
-            d1 = fetch_ohlc_1d(c)
-            if d1 is None or d1.empty or len(d1) < 2:
-                lines.append(f"{c:5}    n/a     n/a    n/a")
-                continue
-            d1i = add_indicators(d1)
-            if d1i is None or d1i.empty:
-                lines.append(f"{c:5}    n/a     n/a    n/a")
+            d1i = per_coin.get(c, {}).get("d1")
+            if d1i is None or len(d1i) < 2:
+                lines.append(_DAILY_NA(c))
                 continue
-            last = d1i.iloc[-1]
-            prev = d1i.iloc[-2]
-            pchg = pct(last["close"], prev["close"])
-            macddelta = (last["macd"] - last["macd_signal"]) - (prev["macd"] - prev["macd_signal"])
-            t = "UP" if last["macd"] >= last["macd_signal"] else "DOWN"
-            lines.append(f"{c:5} {pchg:7.2f}% {macddelta:8.3f}  {t:>5}")
+            cl, m, sg = d1i["close"].to_numpy(), d1i["macd"].to_numpy(), d1i["macd_signal"].to_numpy()
+            pchg = pct(cl[-1], cl[-2])
+            macddelta = (m[-1] - sg[-1]) - (m[-2] - sg[-2])
+            t = "UP" if m[-1] >= sg[-1] else "DOWN"
+            lines.append(_DAILY_ROW(c, pchg, macddelta, t))
         except Exception as e:
             print(f"[DAILY] {c} build err:", e)
-            lines.append(f"{c:5}    n/a     n/a    n/a")
+            lines.append(_DAILY_NA(c))
     return "<pre>" + "\n".join(lines) + "</pre>"
 
 # -----------------------
@@ -470,48 +894,93 @@ def mark_news_cooldown(symbol: str, state, nowu: dt.datetime):
     key = f"{symbol}_NEWS"
     state.setdefault("newsCooldowns", {})[key] = (nowu + timedelta(hours=NEWS_COOLDOWN_H)).timestamp()
 
-def try_send_news(symbol: str, move_pct_24h: float, state, nowu: dt.datetime):
+def fetch_news_message(symbol: str, move_pct_24h: float, state, nowu: dt.datetime, cache: dict | None = None,
+                       log: list | None = None) -> str | None:
+    # Read-only on state (safe to run in worker threads): caller queues the message and marks the cooldown.
+    # cache: this coin's {"etag", "posts"} (updated in place, persisted by run_once) → If-None-Match / 304 reuse
+    # log: collect log lines here instead of printing (worker threads; run_once prints them in coin order)
+    say = print if log is None else log.append
     if not news_allowed_for(symbol, state, nowu, move_pct_24h):
-        print(f"[NEWS] No headlines for {symbol} (PriceΔ {move_pct_24h:+.2f}%).")
-        return
+        say(f"[NEWS] No headlines for {symbol} (PriceΔ {move_pct_24h:+.2f}%).")
+        return None
     url = "https://cryptopanic.com/api/v1/posts/"
     params = {"auth_token": NEWS_TOKEN, "currencies": symbol.lower(), "kind": "news", "public": "true", "filter": "hot"}
+    cache = {} if cache is None else cache
+    headers = {"If-None-Match": cache["etag"]} if cache.get("etag") and "posts" in cache else None
     try:
-        r = requests.get(url, params=params, timeout=15)
-        r.raise_for_status()
-        j = r.json()
-        posts = j.get("results", [])[:5]
+        r = SESSION.get(url, params=params, headers=headers, timeout=15)
+        if r.status_code == 304:
+            posts = cache["posts"]
+        else:
+            r.raise_for_status()
+            j = json_loads(r.content)
+            # keep only what the message uses, so the cached copy in state stays small
+            posts = [{"title": p.get("title", ""), "url": p.get("url", ""),
+                      "votes": {k: v for k, v in (p.get("votes") or {}).items() if k in ("important", "positive", "negative") and v}}
+                     for p in j.get("results", [])[:5]]
+            cache.clear()
+            if r.headers.get("ETag"):
+                cache.update({"etag": r.headers["ETag"], "posts": posts})
         if not posts:
-            print(f"[NEWS] No headlines for {symbol} (PriceΔ {move_pct_24h:+.2f}%).")
-            return
+            say(f"[NEWS] No headlines for {symbol} (PriceΔ {move_pct_24h:+.2f}%).")
+            return None
         lines = [f"🗞️ <b>{symbol} news</b> (Δ24h {move_pct_24h:+.2f}%)"]
         for p in posts:
-            title = p.get("title", "")[:120]
-            link = p.get("url", "")
+            # parse_mode=HTML: a raw &/< in a headline would make Telegram reject the whole message (400)
+            title = html.escape(p.get("title", "")[:120], quote=False)
+            link = html.escape(p.get("url", ""))
             votes = p.get("votes", {})
             tag = []
             if votes.get("important"): tag.append("⭐")
             if votes.get("positive"): tag.append("🟢")
             if votes.get("negative"): tag.append("🔴")
             lines.append("• " + "".join(tag) + f" <a href=\"{link}\">{title}</a>")
-        send_telegram("\n".join(lines))
-        mark_news_cooldown(symbol, state, nowu)
+        return "\n".join(lines)
     except Exception as e:
-        print(f"[NEWS] fetch error for {symbol}: {e}")
+        say(f"[NEWS] fetch error for {symbol}: {e}")
+        return None
+
+def news_for_coin(symbol: str, state, nowu: dt.datetime, cache: dict | None = None):
+    # News intraday – safe per provider errors. Returns (message or None, log lines) so parallel
+    # workers don't interleave their output; the caller prints the lines.
+    log = []
+    try:
+        d1 = fetch_ohlc_1d(symbol)
+        if d1 is None or len(d1) < 2:
+            return None, log
+        cl = d1["close"].to_numpy()
+        move = pct(cl[-1], cl[-2])
+        return fetch_news_message(symbol, move, state, nowu, cache, log), log
+    except Exception as e:
+        log.append(f"[NEWS LOOP] {symbol} fetch err: {e}")
+        return None, log
 
 # -----------------------
 # Main run
 # -----------------------
 def run_once():
+    _OHLC_CACHE.clear()
+    _IND_CACHE.clear()
     state = load_state()
+    PROVIDER_HEALTH.clear()
+    PROVIDER_HEALTH.update(state.get("provider_health", {}))
     nowu = now_utc()
-    print(f"[SYNC] Start: {nowu.strftime('%Y-%m-%d %H:%M:%S')} UTC | Local: {nowu.astimezone().strftime('%Y-%m-%d %H:%M:%S %Z')} | last_daily={state.get('last_daily','')} | last_heartbeat={state.get('last_heartbeat','')}")
+    print(f"[SYNC] Start: {nowu.strftime('%Y-%m-%d %H:%M:%S')} UTC | Local: {nowu.astimezone(LOCAL_TZ).strftime('%Y-%m-%d %H:%M:%S %Z')} | last_daily={state.get('last_daily','')} | last_heartbeat={state.get('last_heartbeat','')}")
+
+    # Every alert of this run is queued here and sent in as few Telegram calls as possible
+    outbox = []
 
-    # Signals
+    # Signals: 1H/1D candles fetched concurrently up-front, then coins evaluated in the pool
+    # (process_coin is read-only on state; updates are merged below in coin order)
+    fetched = prefetch_ohlc(COINS)
+    with ThreadPoolExecutor(max_workers=max(1, min(FETCH_WORKERS, len(COINS)))) as ex:
+        evaluated = list(ex.map(lambda c: process_coin(c, state, nowu, *fetched[c]), COINS))
+    per_coin = {}
     had_buy = False
     had_opp = False
-    for c in COINS:
-        res = evaluate_signals(c, state, nowu)
+    for c, (res, updates) in zip(COINS, evaluated):
+        merge_coin_updates(state, updates)
+        per_coin[c] = res
         if not res.get("ok", False):
             reason = res.get("reason","")
             print(f"{c} no-alert: {reason}")
@@ -522,40 +991,59 @@ def run_once():
         if res.get("buy", False):
             had_buy = True
             msg = f"🟢 <b>BUY</b> {c}/{BASE} ({frame}, 1D {trend})\nPrezzo: {price:.4f}"
-            send_telegram(msg)
+            outbox.append(msg)
         elif res.get("opp", False):
             had_opp = True
             msg = f"🟡 <b>OPPORTUNITY</b> {c}/{BASE} ({frame}, 1D {trend})\nPrezzo: {price:.4f}"
-            send_telegram(msg)
+            outbox.append(msg)
 
     if not had_buy and not had_opp:
         print("Nessun BUY/OPP valido (filtrato da trend 1D / cooldown / condizioni tecniche).")
 
-    # Daily & heartbeat (safe)
+    # Daily & heartbeat (safe): once per local day, first run from DAILY_REPORT_HOUR on (08:02 Rome normally;
+    # a delayed/missed cron still sends later that day). Earlier runs skip both checks.
     try:
-        if should_send_daily_report(state):
-            report = build_daily_table()
-            send_telegram("🗞️ <b>Daily Trend 1D</b>\n" + report)
-            state["last_daily"] = nowu.date().isoformat()
-        if should_send_heartbeat(state):
-            send_telegram("✅ Heartbeat: bot attivo e sincronizzato")
-            state["last_heartbeat"] = nowu.date().isoformat()
+        nowl = nowu.astimezone(LOCAL_TZ)
+        today = nowl.date().isoformat()
+        if nowl.hour >= DAILY_REPORT_HOUR:
+            if should_send_daily_report(state, today):
+                report = build_daily_table(per_coin)
+                outbox.append("🗞️ <b>Daily Trend 1D</b>\n" + report)
+                state["last_daily"] = today
+            if should_send_heartbeat(state, today):
+                outbox.append("✅ Heartbeat: bot attivo e sincronizzato")
+                state["last_heartbeat"] = today
     except Exception as e:
         print(f"[DAILY/HB] error: {e}")
 
-    # News intraday – safe per provider errors
-    for c in COINS:
-        try:
-            d1 = fetch_ohlc_1d(c)
-            if d1 is None or len(d1) < 2:
-                continue
-            last = d1.iloc[-1]["close"]
-            prev = d1.iloc[-2]["close"]
-            move = pct(last, prev)
-            try_send_news(c, move, state, nowu)
-        except Exception as e:
-            print(f"[NEWS LOOP] {c} fetch err: {e}")
-
+    # News intraday: CryptoPanic calls run concurrently (each on its own copy of the coin's ETag cache),
+    # state is updated here in coin order
+    news_cache = {c: dict(state.get("news_cache", {}).get(c, {})) for c in COINS}
+    with ThreadPoolExecutor(max_workers=max(1, min(FETCH_WORKERS, len(COINS)))) as ex:
+        news = list(ex.map(lambda c: news_for_coin(c, state, nowu, news_cache[c]), COINS))
+    for c, (msg, log) in zip(COINS, news):
+        for line in log:
+            print(line)
+        if msg:
+            outbox.append(msg)
+            mark_news_cooldown(c, state, nowu)
+    state["news_cache"] = {c: v for c, v in news_cache.items() if v}
+
+    # Whatever a previous run failed to deliver goes first, in its own chunks: a backlog that still fails
+    # can't take this run's alerts down with it
+    backlog = state.get("outbox", [])
+    if backlog:
+        print(f"[TELEGRAM] retrying {len(backlog)} unsent message(s)")
+    unsent = flush_telegram(backlog)
+    # New messages queued for a later run carry their original time (a late "Prezzo" is not the current one)
+    stamp = f"\n🕒 {nowu.astimezone(LOCAL_TZ).strftime('%d/%m %H:%M')} (invio ritardato)"
+    unsent += [m + stamp for m in flush_telegram(outbox)]
+    if len(unsent) > MAX_OUTBOX:
+        print(f"[TELEGRAM] outbox full, dropping {len(unsent) - MAX_OUTBOX} oldest message(s)")
+    state["outbox"] = unsent[max(0, len(unsent) - MAX_OUTBOX):]
+    # copy under the lock: a hedged straggler may still be updating PROVIDER_HEALTH
+    with _HEALTH_LOCK:
+        state["provider_health"] = {p: dict(h) for p, h in PROVIDER_HEALTH.items()}
     save_state(state)
 
 if __name__ == "__main__":